@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
+import hashlib
 import io
 from crypto_tax_calculator import CryptoTaxCalculator
 from csv_parser import CSVParser
@@ -15,6 +14,75 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Uploads larger than this are streamed through the calculator in chunks
+LARGE_FILE_BYTES = 50 * 1024 * 1024
+
+# Rows per page in the transaction details table
+DETAIL_PAGE_SIZE = 200
+
+# Detail tables kept in the cache - one per recent upload is plenty
+DETAIL_CACHE_ENTRIES = 4
+
+def _hash_dataframe(df):
+    """Cheap cache key for a DataFrame: its shape plus a row-hash checksum"""
+    return df.shape, int(pd.util.hash_pandas_object(df).sum())
+
+@st.cache_data(show_spinner=False)
+def load_transactions(file_hash, _file_bytes):
+    """
+    Parse an uploaded CSV, cached by the hash of its contents
+    
+    Streamlit reruns the whole script on every interaction; keying on
+    file_hash means the upload is only parsed once. _file_bytes is not
+    hashed by Streamlit (leading underscore).
+    
+    Returns:
+        Tuple of (DataFrame or None, list of (level, text) messages)
+    """
+    parser = CSVParser()
+    df = parser.parse_csv(io.BytesIO(_file_bytes))
+    return df, parser.messages
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_dataframe})
+def run_tax_calculation(df):
+    """
+    Run the FIFO tax calculation, cached per transaction DataFrame
+    
+    Returns:
+        Tuple of (results dict or None, list of (level, text) messages)
+    """
+    calculator = CryptoTaxCalculator()
+    results = calculator.calculate_taxes(df)
+    return results, calculator.messages
+
+@st.cache_data(show_spinner=False)
+def run_chunked_tax_calculation(file_hash, _file_bytes):
+    """
+    Parse and calculate a large upload chunk by chunk, cached by file hash
+    
+    Returns:
+        Tuple of (results dict or None, list of (level, text) messages)
+    """
+    parser = CSVParser()
+    calculator = CryptoTaxCalculator()
+    results = calculator.calculate_taxes_chunked(parser.parse_csv_chunked(io.BytesIO(_file_bytes)))
+    return results, parser.messages + calculator.messages
+
+@st.cache_data(show_spinner=False, max_entries=DETAIL_CACHE_ENTRIES)
+def build_detail_frame(details):
+    """Build the transaction details DataFrame from its column arrays"""
+    return pd.DataFrame(details)
+
+@st.cache_data(show_spinner=False, max_entries=DETAIL_CACHE_ENTRIES)
+def build_detail_csv(details):
+    """CSV export of the transaction details"""
+    return build_detail_frame(details).to_csv(index=False)
+
+def show_messages(messages):
+    """Display (level, text) messages returned by the cached helpers"""
+    for level, text in messages:
+        getattr(st, level)(text)
+
 def main():
     st.title("🚀 Crypto Tax Calculator")
     st.markdown("**Stop the crypto tax nightmare.** Upload your trade history CSV and instantly see your profit, loss, and estimated taxes.")
@@ -67,8 +135,15 @@ def main():
     if uploaded_file is not None:
         try:
             # Parse the CSV
-            parser = CSVParser()
-            df = parser.parse_csv(uploaded_file)
+            file_bytes = uploaded_file.getvalue()
+            file_hash = hashlib.blake2b(file_bytes).hexdigest()
+            
+            if len(file_bytes) > LARGE_FILE_BYTES:
+                process_large_file(file_hash, file_bytes)
+                return
+            
+            df, messages = load_transactions(file_hash, file_bytes)
+            show_messages(messages)
             
             if df is not None and not df.empty:
                 st.success(f"✅ Successfully loaded {len(df)} transactions")
@@ -82,10 +157,10 @@ def main():
                 with col1:
                     st.metric("Total Transactions", len(df))
                 with col2:
-                    buy_count = len(df[df['type'].str.lower() == 'buy'])
+                    buy_count = int((df['type'] == 'buy').sum())
                     st.metric("Buy Orders", buy_count)
                 with col3:
-                    sell_count = len(df[df['type'].str.lower() == 'sell'])
+                    sell_count = int((df['type'] == 'sell').sum())
                     st.metric("Sell Orders", sell_count)
                 with col4:
                     unique_symbols = df['symbol'].nunique()
@@ -95,8 +170,8 @@ def main():
                 st.header("💰 Tax Calculations")
                 
                 with st.spinner("Calculating taxes using FIFO method..."):
-                    calculator = CryptoTaxCalculator()
-                    results = calculator.calculate_taxes(df)
+                    results, messages = run_tax_calculation(df)
+                show_messages(messages)
                 
                 if results:
                     # Display results
@@ -113,6 +188,27 @@ def main():
             st.error(f"❌ Error processing file: {str(e)}")
             st.info("💡 Please ensure your CSV contains the required columns: date, symbol, type, quantity, price")
 
+def process_large_file(file_hash, file_bytes):
+    """Calculate taxes for a large upload without loading it all at once"""
+    
+    st.info("📦 Large file detected - processing in chunks. The file must be sorted by date (oldest first), and per-transaction details are not shown.")
+    
+    st.header("💰 Tax Calculations")
+    
+    with st.spinner("Calculating taxes using FIFO method..."):
+        results, messages = run_chunked_tax_calculation(file_hash, file_bytes)
+    show_messages(messages)
+    
+    if results:
+        st.success(f"✅ Successfully processed {results['total_transactions']} transactions")
+        
+        # Display results
+        display_tax_results(results)
+        
+        # Export functionality
+        st.header("📥 Export Results")
+        export_results(results, None)
+
 def display_tax_results(results):
     """Display tax calculation results with charts and breakdowns"""
     
@@ -165,34 +261,51 @@ def display_tax_results(results):
         st.subheader("📋 Transaction Details")
         
         # Convert to DataFrame for display
-        detail_df = pd.DataFrame(results['transactions_detail'])
+        detail_df = build_detail_frame(results['transactions_detail'])
         if not detail_df.empty:
-            # Format the display
-            detail_df['gain_loss'] = detail_df['gain_loss'].apply(lambda x: f"${x:,.2f}")
-            detail_df['proceeds'] = detail_df['proceeds'].apply(lambda x: f"${x:,.2f}")
-            detail_df['cost_basis'] = detail_df['cost_basis'].apply(lambda x: f"${x:,.2f}")
+            # Send one page at a time to the browser
+            page_count = (len(detail_df) - 1) // DETAIL_PAGE_SIZE + 1
+            page = st.number_input(
+                f"Page (1-{page_count})",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                step=1
+            )
+            start = (page - 1) * DETAIL_PAGE_SIZE
+            end = min(start + DETAIL_PAGE_SIZE, len(detail_df))
             
-            st.dataframe(detail_df, use_container_width=True)
+            # Format the display client-side
+            dollar_column = st.column_config.NumberColumn(format="$%.2f")
+            st.dataframe(
+                detail_df.iloc[start:end],
+                use_container_width=True,
+                column_config={
+                    'gain_loss': dollar_column,
+                    'proceeds': dollar_column,
+                    'cost_basis': dollar_column
+                }
+            )
+            st.caption(f"Showing transactions {start + 1}-{end} of {len(detail_df)}")
     
     # Charts
     st.subheader("📊 Visualizations")
     
     # Gain/Loss breakdown chart
     if results['short_term_gain'] != 0 or results['long_term_gain'] != 0:
-        fig = go.Figure(data=[
-            go.Bar(
-                x=['Short-term', 'Long-term'],
-                y=[results['short_term_gain'], results['long_term_gain']],
-                marker_color=['red' if results['short_term_gain'] < 0 else 'green',
-                             'red' if results['long_term_gain'] < 0 else 'green']
-            )
-        ])
-        fig.update_layout(
-            title="Capital Gains/Loss Breakdown",
-            yaxis_title="Amount ($)",
-            xaxis_title="Holding Period"
+        st.markdown("**Capital Gains/Loss Breakdown**")
+        gains = pd.Series(
+            [results['short_term_gain'], results['long_term_gain']],
+            index=['Short-term', 'Long-term']
+        )
+        # Gains and losses as separate series so they get their own colors
+        chart_df = pd.DataFrame({'Gain': gains.clip(lower=0), 'Loss': gains.clip(upper=0)})
+        st.bar_chart(
+            chart_df,
+            x_label="Holding Period",
+            y_label="Amount ($)",
+            color=['#2ca02c', '#d62728']
         )
-        st.plotly_chart(fig, use_container_width=True)
     
     # Holdings summary if available
     if results.get('holdings_summary'):
@@ -235,8 +348,7 @@ def export_results(results, original_df):
     with col2:
         # Export detailed transactions if available
         if results.get('transactions_detail'):
-            detail_df = pd.DataFrame(results['transactions_detail'])
-            csv_detail = detail_df.to_csv(index=False)
+            csv_detail = build_detail_csv(results['transactions_detail'])
             st.download_button(
                 label="📊 Download Detailed Report (CSV)",
                 data=csv_detail,
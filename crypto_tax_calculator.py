@@ -1,11 +1,16 @@
 from tax_calculations import TaxCalculations
+from csv_parser import CSVParseError
+from ui_messages import UIMessages
 import pandas as pd
-import streamlit as st
 
-class CryptoTaxCalculator:
+# Transaction types the FIFO calculation understands; other rows are ignored
+VALID_TYPES = ['buy', 'sell']
+
+class CryptoTaxCalculator(UIMessages):
     """Main calculator class that orchestrates tax calculations"""
     
     def __init__(self):
+        self._clear_messages()
         self.tax_calc = TaxCalculations()
     
     def calculate_taxes(self, df):
@@ -16,8 +21,10 @@ class CryptoTaxCalculator:
             df: DataFrame with columns: date, symbol, type, quantity, price
             
         Returns:
-            Dictionary with tax calculation results
+            Dictionary with tax calculation results. Errors and warnings
+            are recorded in self.messages.
         """
+        self._clear_messages()
         try:
             # Validate input data
             if not self._validate_input(df):
@@ -35,39 +42,96 @@ class CryptoTaxCalculator:
             return results
             
         except Exception as e:
-            st.error(f"Error in tax calculations: {str(e)}")
+            self._notify('error', f"Error in tax calculations: {str(e)}")
+            return None
+    
+    def calculate_taxes_chunked(self, chunks):
+        """
+        Calculate taxes for trade data streamed in date-ordered chunks
+        
+        Used for files too large to load at once, so only the totals and
+        holdings are kept - no per-lot transaction details.
+        
+        Args:
+            chunks: Iterable of DataFrames, e.g. from CSVParser.parse_csv_chunked
+            
+        Returns:
+            Dictionary with tax calculation results
+        """
+        self._clear_messages()
+        row_counts = []
+        invalid_types = set()
+        parse_failed = False
+        
+        def counted(chunks):
+            nonlocal parse_failed
+            try:
+                for chunk in chunks:
+                    row_counts.append(len(chunk))
+                    invalid_types.update(chunk.loc[~chunk['type'].isin(VALID_TYPES), 'type'].unique())
+                    yield chunk
+            except CSVParseError:
+                # The parser has already recorded what was wrong with the file
+                parse_failed = True
+        
+        try:
+            results = self.tax_calc.calculate_fifo_taxes_chunked(counted(chunks), include_details=False)
+            
+            if parse_failed:
+                return None
+            
+            if invalid_types:
+                self._notify('warning', f"Found unexpected transaction types that will be ignored: {', '.join(sorted(invalid_types))}")
+            
+            if sum(row_counts) == 0:
+                self._notify('error', "No valid transactions found after filtering")
+                return None
+            
+            # Add metadata
+            results['calculation_date'] = pd.Timestamp.now()
+            results['total_transactions'] = sum(row_counts)
+            results['tax_method'] = 'FIFO'
+            results['tax_rates'] = self.tax_calc.get_tax_rate_info()
+            
+            return results
+            
+        except Exception as e:
+            # Already prefixed by TaxCalculations.calculate_fifo_taxes_chunked
+            self._notify('error', str(e))
             return None
     
     def _validate_input(self, df):
         """Validate input DataFrame"""
         
         if df is None or df.empty:
-            st.error("No transaction data provided")
+            self._notify('error', "No transaction data provided")
             return False
         
         required_columns = ['date', 'symbol', 'type', 'quantity', 'price']
         missing_columns = [col for col in required_columns if col not in df.columns]
         
         if missing_columns:
-            st.error(f"Missing required columns: {', '.join(missing_columns)}")
+            self._notify('error', f"Missing required columns: {', '.join(missing_columns)}")
             return False
         
         # Check for valid transaction types
-        valid_types = ['buy', 'sell']
-        invalid_types = df[~df['type'].str.lower().isin(valid_types)]['type'].unique()
+        is_valid_type = df['type'].isin(VALID_TYPES)
+        invalid_types = df.loc[~is_valid_type, 'type'].unique()
         
         if len(invalid_types) > 0:
-            st.warning(f"Found unexpected transaction types that will be ignored: {', '.join(invalid_types)}")
+            self._notify('warning', f"Found unexpected transaction types that will be ignored: {', '.join(invalid_types)}")
             # Filter to only valid types
-            df = df[df['type'].str.lower().isin(valid_types)]
+            df = df[is_valid_type]
         
-        # Check for negative quantities or prices
-        if (df['quantity'] <= 0).any() or (df['price'] <= 0).any():
-            st.warning("Found transactions with zero or negative quantities/prices. These will be filtered out.")
-            df = df[(df['quantity'] > 0) & (df['price'] > 0)]
+        # Check for negative quantities or prices - one fused mask, used
+        # for both the check and the filter
+        is_positive = (df['quantity'].to_numpy() > 0) & (df['price'].to_numpy() > 0)
+        if not is_positive.all():
+            self._notify('warning', "Found transactions with zero or negative quantities/prices. These will be filtered out.")
+            df = df.loc[is_positive]
         
         if df.empty:
-            st.error("No valid transactions found after filtering")
+            self._notify('error', "No valid transactions found after filtering")
             return False
         
         return True
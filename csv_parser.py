@@ -1,12 +1,72 @@
 import pandas as pd
-import streamlit as st
-from datetime import datetime
-import re
+from ui_messages import UIMessages
 
-class CSVParser:
+# Quote-currency suffix on trading pairs, e.g. BTC/USD, ETH-USDT, SOL/EUR.
+# Kept as a plain string: on Arrow-backed strings pandas hands it to
+# pyarrow.compute.replace_substring_regex (RE2, no backtracking), whereas a
+# compiled re.Pattern would force the per-element Python fallback
+QUOTE_SUFFIX_PATTERN = r'[/\-](?:USDT|USDC|USD|EUR|GBP|BTC).*$'
+
+# Exchange column names -> standard names (keys are lowercase)
+COLUMN_MAPPINGS = {
+    # Date columns
+    'timestamp': 'date',
+    'time': 'date',
+    'datetime': 'date',
+    'created_at': 'date',
+    'trade_time': 'date',
+    'order_time': 'date',
+    
+    # Symbol columns
+    'coin': 'symbol',
+    'asset': 'symbol',
+    'currency': 'symbol',
+    'pair': 'symbol',
+    'base_asset': 'symbol',
+    'product': 'symbol',
+    
+    # Type columns
+    'side': 'type',
+    'transaction_type': 'type',
+    'order_type': 'type',
+    'trade_type': 'type',
+    'action': 'type',
+    
+    # Quantity columns
+    'amount': 'quantity',
+    'size': 'quantity',
+    'volume': 'quantity',
+    'filled_size': 'quantity',
+    'base_amount': 'quantity',
+    'qty': 'quantity',
+    
+    # Price columns
+    'rate': 'price',
+    'unit_price': 'price',
+    'price_per_unit': 'price',
+    'fill_price': 'price',
+    'executed_price': 'price',
+    'avg_price': 'price'
+}
+
+# Currency symbols and thousands separators to drop from numeric values
+CURRENCY_TABLE = str.maketrans('', '', '$,€£')
+
+def _strip_currency(value):
+    """read_csv converter: '$1,234.50' -> 1234.5, unparseable -> NaN"""
+    try:
+        return float(value.translate(CURRENCY_TABLE))
+    except ValueError:
+        return float('nan')
+
+class CSVParseError(ValueError):
+    """Raised by CSVParser.parse_csv_chunked; the reason is in its messages"""
+
+class CSVParser(UIMessages):
     """Handles parsing of CSV files from various crypto exchanges"""
     
     def __init__(self):
+        self._clear_messages()
         self.common_date_formats = [
             '%Y-%m-%d %H:%M:%S',
             '%Y-%m-%d %H:%M:%S.%f',
@@ -21,13 +81,31 @@ class CSVParser:
         ]
     
     def parse_csv(self, uploaded_file):
-        """Parse uploaded CSV file and standardize format"""
+        """
+        Parse uploaded CSV file and standardize format
+        
+        Problems are recorded in self.messages instead of being shown
+        directly, so the result can be cached and replayed by the UI.
+        """
+        self._clear_messages()
         try:
-            # Read the CSV file
-            df = pd.read_csv(uploaded_file)
+            # Read the header first so dtypes and converters can be keyed by
+            # the exchange's own column names
+            header = pd.read_csv(uploaded_file, nrows=0).columns
+            uploaded_file.seek(0)
+            standard_names = self._standardize_columns(pd.DataFrame(columns=header)).columns
+            
+            # Read the CSV file, converting values while parsing instead of
+            # coercing object columns afterwards
+            df = pd.read_csv(
+                uploaded_file,
+                engine='c',
+                low_memory=False,
+                **self._column_read_options(header, standard_names)
+            )
             
             if df.empty:
-                st.error("The uploaded file is empty.")
+                self._notify('error', "The uploaded file is empty.")
                 return None
             
             # Standardize column names
@@ -41,7 +119,7 @@ class CSVParser:
             df = self._clean_data(df)
             
             # Parse dates
-            df = self._parse_dates(df)
+            df, _ = self._parse_dates(df)
             
             # Check if date parsing failed
             if df is None:
@@ -53,61 +131,98 @@ class CSVParser:
             return df
             
         except Exception as e:
-            st.error(f"Error reading CSV file: {str(e)}")
+            self._notify('error', f"Error reading CSV file: {str(e)}")
             return None
     
+    def parse_csv_chunked(self, uploaded_file, chunksize=100_000):
+        """
+        Parse a large CSV in chunks, yielding cleaned, date-parsed DataFrames
+        
+        Only one chunk is held in memory at a time. FIFO needs transactions
+        in date order, so the file must already be sorted oldest first.
+        
+        Problems are recorded in self.messages, as in parse_csv, and then
+        reading stops with a CSVParseError - e.g. missing columns, dates
+        that cannot be parsed, or a chunk that goes back in time.
+        """
+        self._clear_messages()
+        try:
+            yield from self._read_chunks(uploaded_file, chunksize)
+        except CSVParseError:
+            raise
+        except Exception as e:
+            self._notify('error', f"Error reading CSV file: {str(e)}")
+            raise CSVParseError(str(e)) from e
+    
+    def _read_chunks(self, uploaded_file, chunksize):
+        """Generator behind parse_csv_chunked"""
+        header = pd.read_csv(uploaded_file, nrows=0).columns
+        uploaded_file.seek(0)
+        standard_names = self._standardize_columns(pd.DataFrame(columns=header)).columns
+        
+        if not self._validate_columns(pd.DataFrame(columns=standard_names)):
+            raise CSVParseError("Missing required columns")
+        
+        last_date = None
+        reader = pd.read_csv(
+            uploaded_file,
+            engine='c',
+            chunksize=chunksize,
+            **self._column_read_options(header, standard_names)
+        )
+        
+        # Chosen from the first non-empty chunk and reused for the rest, so
+        # a chunk whose days all happen to be 12 or less is not read as
+        # mm/dd in a dd/mm file
+        date_format = None
+        
+        with reader:
+            for chunk in reader:
+                chunk = self._standardize_columns(chunk)
+                chunk = self._clean_data(chunk)
+                if chunk.empty:
+                    continue
+                
+                chunk, date_format = self._parse_dates(chunk, date_format)
+                
+                if chunk is None:
+                    raise CSVParseError("Could not parse date column")
+                if chunk.empty:
+                    continue
+                
+                dates = chunk['date']
+                if not dates.is_monotonic_increasing or (last_date is not None and dates.iloc[0] < last_date):
+                    message = "Large files must be sorted by date (oldest first) to be processed in chunks"
+                    self._notify('error', message)
+                    raise CSVParseError(message)
+                last_date = dates.iloc[-1]
+                
+                yield chunk.reset_index(drop=True)
+    
+    def _column_read_options(self, raw_columns, standard_columns):
+        """Build read_csv dtype/converters for the columns we care about"""
+        dtype = {}
+        converters = {}
+        
+        for raw_name, standard_name in zip(raw_columns, standard_columns):
+            if standard_name in ('symbol', 'type'):
+                dtype[raw_name] = 'string[pyarrow]'
+            elif standard_name in ('quantity', 'price'):
+                converters[raw_name] = _strip_currency
+        
+        return {'dtype': dtype, 'converters': converters}
+    
     def _standardize_columns(self, df):
         """Standardize column names across different exchange formats"""
         
         # Convert all column names to lowercase for easier matching
         df.columns = df.columns.str.lower().str.strip()
         
-        # Common column name mappings
-        column_mappings = {
-            # Date columns
-            'timestamp': 'date',
-            'time': 'date',
-            'datetime': 'date',
-            'created_at': 'date',
-            'trade_time': 'date',
-            'order_time': 'date',
-            
-            # Symbol columns
-            'coin': 'symbol',
-            'asset': 'symbol',
-            'currency': 'symbol',
-            'pair': 'symbol',
-            'base_asset': 'symbol',
-            'product': 'symbol',
-            
-            # Type columns
-            'side': 'type',
-            'transaction_type': 'type',
-            'order_type': 'type',
-            'trade_type': 'type',
-            'action': 'type',
-            
-            # Quantity columns
-            'amount': 'quantity',
-            'size': 'quantity',
-            'volume': 'quantity',
-            'filled_size': 'quantity',
-            'base_amount': 'quantity',
-            'qty': 'quantity',
-            
-            # Price columns
-            'rate': 'price',
-            'unit_price': 'price',
-            'price_per_unit': 'price',
-            'fill_price': 'price',
-            'executed_price': 'price',
-            'avg_price': 'price'
-        }
-        
-        # Apply mappings
-        for old_name, new_name in column_mappings.items():
-            if old_name in df.columns:
-                df.rename(columns={old_name: new_name}, inplace=True)
+        # Apply mappings in a single rename
+        df.rename(
+            columns={old: new for old, new in COLUMN_MAPPINGS.items() if old in df.columns},
+            inplace=True
+        )
         
         return df
     
@@ -121,9 +236,9 @@ class CSVParser:
                 missing_columns.append(col)
         
         if missing_columns:
-            st.error(f"Missing required columns: {', '.join(missing_columns)}")
-            st.info("Available columns: " + ", ".join(df.columns.tolist()))
-            st.info("""
+            self._notify('error', f"Missing required columns: {', '.join(missing_columns)}")
+            self._notify('info', "Available columns: " + ", ".join(df.columns.tolist()))
+            self._notify('info', """
             Please ensure your CSV contains columns for:
             - Date/Timestamp
             - Symbol/Coin
@@ -140,15 +255,13 @@ class CSVParser:
         
         # Clean symbol column - remove quotes, spaces, convert to uppercase
         if 'symbol' in df.columns:
-            df['symbol'] = df['symbol'].astype(str).str.strip().str.upper()
-            # Remove common suffixes like /USD, -USD, etc.
-            df['symbol'] = df['symbol'].str.replace(r'[/-]USD.*', '', regex=True)
-            df['symbol'] = df['symbol'].str.replace(r'[/-]USDT.*', '', regex=True)
-            df['symbol'] = df['symbol'].str.replace(r'[/-]EUR.*', '', regex=True)
+            df['symbol'] = df['symbol'].astype('string[pyarrow]').str.strip().str.upper()
+            # Remove common suffixes like /USD, -USDT, etc. in a single pass
+            df['symbol'] = df['symbol'].str.replace(QUOTE_SUFFIX_PATTERN, '', regex=True)
         
         # Clean type column - standardize buy/sell
         if 'type' in df.columns:
-            df['type'] = df['type'].astype(str).str.lower().str.strip()
+            df['type'] = df['type'].astype('string[pyarrow]').str.lower().str.strip()
             # Map common variations
             type_mappings = {
                 'purchase': 'buy',
@@ -165,49 +278,74 @@ class CSVParser:
         # Convert numeric columns
         numeric_columns = ['quantity', 'price']
         for col in numeric_columns:
-            if col in df.columns:
-                # Remove currency symbols and commas
-                df[col] = df[col].astype(str).str.replace(r'[$,€£]', '', regex=True)
+            # Already numeric when read through parse_csv's converters
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+                # Remove currency symbols and commas - a plain character
+                # delete, so str.translate instead of a regex
+                df[col] = df[col].astype(str).str.translate(CURRENCY_TABLE)
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         
         # Remove rows with missing critical data
         df = df.dropna(subset=['date', 'symbol', 'type', 'quantity', 'price'])
         
         # Filter out zero quantities and prices
-        df = df[(df['quantity'] > 0) & (df['price'] > 0)]
+        is_positive = (df['quantity'].to_numpy() > 0) & (df['price'].to_numpy() > 0)
+        df = df.loc[is_positive]
+        
+        # Compact dtypes: symbols are already Arrow-backed strings; a category
+        # for the handful of transaction types makes comparisons work on
+        # integer codes
+        df = df.assign(type=df['type'].astype('category'))
         
         return df
     
-    def _parse_dates(self, df):
-        """Parse date column using various formats"""
+    def _parse_dates(self, df, date_format=None):
+        """
+        Parse date column using various formats
+        
+        ISO 8601 covers most exchange exports and is tried first. Otherwise
+        the known formats are tried in order and the first one that parses
+        the whole column is used, so dd/mm and mm/dd files are never mixed
+        up row by row. Per-value inference with format='mixed' is only a
+        last resort. Timezone-aware timestamps are converted to naive UTC.
+        
+        Pass the date_format chosen for an earlier part of the same file to
+        parse with that format only; a ValueError is raised when the dates
+        do not match it.
+        
+        Returns:
+            Tuple of (DataFrame or None, the date format used)
+        """
         
         if 'date' not in df.columns:
-            return df
+            return df, date_format
         
-        # Try to parse dates with multiple formats
-        date_parsed = False
+        dates = df['date']
         
-        for date_format in self.common_date_formats:
+        if date_format is not None:
+            errors = 'coerce' if date_format == 'mixed' else 'raise'
             try:
-                df['date'] = pd.to_datetime(df['date'], format=date_format, errors='raise')
-                date_parsed = True
-                break
+                parsed = pd.to_datetime(dates, format=date_format, utc=True, errors=errors, cache=True)
             except (ValueError, TypeError):
-                continue
+                raise ValueError(f"Dates do not all match the format used earlier in the file ({date_format})")
+        else:
+            for date_format in ['ISO8601', *self.common_date_formats]:
+                try:
+                    parsed = pd.to_datetime(dates, format=date_format, utc=True, errors='raise', cache=True)
+                    break
+                except (ValueError, TypeError):
+                    continue
+            else:
+                date_format = 'mixed'
+                parsed = pd.to_datetime(dates, format=date_format, utc=True, errors='coerce', cache=True)
         
-        # If specific formats fail, try pandas auto-detection
-        if not date_parsed:
-            try:
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                date_parsed = True
-            except:
-                pass
+        if parsed.isna().all():
+            self._notify('error', "Could not parse date column. Please ensure dates are in a standard format.")
+            return None, date_format
         
-        if not date_parsed:
-            st.error("Could not parse date column. Please ensure dates are in a standard format.")
-            return None
+        df['date'] = parsed.dt.tz_convert(None)
         
         # Remove rows with invalid dates
         df = df.dropna(subset=['date'])
         
-        return df
+        return df, date_format
@@ -1,8 +1,178 @@
 import pandas as pd
 from datetime import datetime, timedelta
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional - fall back to the NumPy matcher
+    njit = None
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+# Chunks with fewer rows than this are not worth spreading across threads
+PARALLEL_MIN_ROWS = 50_000
+
+# Leftovers smaller than this fraction of a lot or sale are floating-point
+# rounding, not real quantities - the lot or sale counts as used up
+QUANTITY_RTOL = 1e-12
+
+
+def _fifo_match_vectorized(buy_qty, buy_price, buy_date_ns, sell_qty, sell_price,
+                           sell_date_ns, buys_before, threshold_ns):
+    """
+    Match sales against buy lots using cumulative quantities
+    
+    Buys and sells are laid out on a cumulative quantity axis. Sell i
+    consumes the buy units in (consumed[i-1], consumed[i]], and the buy lots
+    overlapping that range are located with np.searchsorted.
+    
+    Returns:
+        Tuple of (short_gain, long_gain, det_sale, det_lot, det_qty, lot_qty, head)
+        where det_* describe each matched (sale, lot) pair and lot_qty/head
+        is the open lot book: lots before head are sold in full.
+    """
+    # Cumulative buy units, with a leading zero so buy_cum[k] is the
+    # start of lot k and buy_cum[k + 1] its end
+    buy_cum = np.concatenate(([0.0], np.cumsum(buy_qty)))
+    
+    # Units bought before each sale - a sale can only consume lots that
+    # were already purchased when it happened
+    available = buy_cum[buys_before]
+    
+    # Units consumed after each sale. Any part of a sale not covered by
+    # earlier purchases is dropped, so consumed[i] is
+    # min(consumed[i-1] + sell_qty[i], available[i]), solved in closed
+    # form with a running minimum
+    sell_cum = np.cumsum(sell_qty)
+    shortfall = np.minimum.accumulate(np.minimum(available - sell_cum, 0.0))
+    sell_end = np.minimum(sell_cum + shortfall, available)
+    sell_start = np.concatenate(([0.0], sell_end[:-1]))
+    
+    # Cumulative sums carry rounding error, so differences within a few ulps
+    # of the largest running total are treated as zero rather than as tiny
+    # lots
+    scale = max(buy_cum[-1], sell_cum[-1] if len(sell_cum) > 0 else 0.0)
+    tolerance = 4 * np.finfo(np.float64).eps * scale
+    
+    # Buy lots overlapping each sale's consumed range
+    first_lot = np.searchsorted(buy_cum[1:], sell_start, side='right')
+    last_lot = np.searchsorted(buy_cum[1:], sell_end, side='left')
+    lot_counts = np.where(sell_end > sell_start, last_lot - first_lot + 1, 0)
+    
+    # Expand to one row per (sale, lot) pair
+    det_sale = np.repeat(np.arange(len(sell_qty)), lot_counts)
+    pair_offsets = np.arange(len(det_sale)) - np.repeat(np.cumsum(lot_counts) - lot_counts, lot_counts)
+    det_lot = first_lot[det_sale] + pair_offsets
+    
+    det_qty = (
+        np.minimum(buy_cum[det_lot + 1], sell_end[det_sale])
+        - np.maximum(buy_cum[det_lot], sell_start[det_sale])
+    )
+    matched = det_qty > np.maximum(
+        tolerance,
+        QUANTITY_RTOL * np.minimum(buy_qty[det_lot], sell_qty[det_sale])
+    )
+    det_sale = det_sale[matched]
+    det_lot = det_lot[matched]
+    det_qty = det_qty[matched]
+    
+    gain_loss = det_qty * (sell_price[det_sale] - buy_price[det_lot])
+    is_long_term = sell_date_ns[det_sale] - buy_date_ns[det_lot] >= threshold_ns
+    short_gain = gain_loss[~is_long_term].sum()
+    long_gain = gain_loss[is_long_term].sum()
+    
+    # Open lot book - only lot_qty[head] can be partially consumed
+    consumed = sell_end[-1] if len(sell_end) > 0 else 0.0
+    lot_qty = buy_qty.copy()
+    head = int(np.searchsorted(buy_cum[1:], consumed + tolerance, side='right'))
+    if head < len(lot_qty):
+        lot_qty[head] = buy_cum[head + 1] - consumed
+        
+        # A rounding-level leftover means the lot was sold in full
+        if lot_qty[head] <= max(tolerance, QUANTITY_RTOL * buy_qty[head]):
+            lot_qty[head] = 0.0
+            head += 1
+    
+    return short_gain, long_gain, det_sale, det_lot, det_qty, lot_qty, head
+
+
+def _fifo_match_kernel(buy_qty, buy_price, buy_date_ns, sell_qty, sell_price,
+                       sell_date_ns, buys_before, threshold_ns):
+    """
+    Match sales against buy lots one lot at a time
+    
+    Same inputs and outputs as _fifo_match_vectorized. This is the plain
+    FIFO loop over a head pointer, written with scalar float64/int64
+    operations only so numba can compile it.
+    """
+    lot_qty = buy_qty.copy()
+    
+    # Every pair either finishes a lot or finishes a sale
+    max_pairs = len(buy_qty) + len(sell_qty)
+    det_sale = np.empty(max_pairs, dtype=np.int64)
+    det_lot = np.empty(max_pairs, dtype=np.int64)
+    det_qty = np.empty(max_pairs, dtype=np.float64)
+    n_pairs = 0
+    
+    short_gain = 0.0
+    long_gain = 0.0
+    head = 0
+    
+    for i in range(len(sell_qty)):
+        remaining_to_sell = sell_qty[i]
+        
+        while remaining_to_sell > 0 and head < buys_before[i]:
+            # Leftovers at rounding level of either the lot or the sale
+            # count as zero rather than as a sliver of the lot
+            tolerance = QUANTITY_RTOL * max(buy_qty[head], sell_qty[i])
+            
+            if lot_qty[head] <= remaining_to_sell + tolerance:
+                # Sell entire lot
+                quantity_sold = lot_qty[head]
+                lot_sold_out = True
+            else:
+                # Partial sale of lot
+                quantity_sold = remaining_to_sell
+                lot_sold_out = False
+            
+            gain_loss = quantity_sold * (sell_price[i] - buy_price[head])
+            if sell_date_ns[i] - buy_date_ns[head] >= threshold_ns:
+                long_gain += gain_loss
+            else:
+                short_gain += gain_loss
+            
+            det_sale[n_pairs] = i
+            det_lot[n_pairs] = head
+            det_qty[n_pairs] = quantity_sold
+            n_pairs += 1
+            
+            remaining_to_sell -= quantity_sold
+            if remaining_to_sell <= tolerance:
+                remaining_to_sell = 0.0
+            
+            if lot_sold_out:
+                # "popleft" - move the head past the exhausted lot
+                lot_qty[head] = 0.0
+                head += 1
+            else:
+                lot_qty[head] -= quantity_sold
+                if lot_qty[head] <= tolerance:
+                    lot_qty[head] = 0.0
+                    head += 1
+    
+    return (short_gain, long_gain, det_sale[:n_pairs], det_lot[:n_pairs],
+            det_qty[:n_pairs], lot_qty, head)
+
+
+if njit is not None:
+    _fifo_match_kernel = njit(cache=True, nogil=True)(_fifo_match_kernel)
+    _fifo_match = _fifo_match_kernel
+else:
+    _fifo_match = _fifo_match_vectorized
+
+
 class TaxCalculations:
     """Handles crypto tax calculations using FIFO methodology"""
     
@@ -12,34 +182,114 @@ class TaxCalculations:
         self.long_term_tax_rate = 0.15   # 15% for long-term gains
         self.long_term_threshold_days = 365  # Days to qualify for long-term
     
-    def calculate_fifo_taxes(self, df):
+    def calculate_fifo_taxes(self, df, include_details=True):
         """
         Calculate taxes using FIFO (First In, First Out) method
+        
+        Args:
+            df: DataFrame with columns: date, symbol, type, quantity, price
+            include_details: Build the per-lot transactions_detail rows. Skip
+                them when only the totals are needed.
+        """
+        return self.calculate_fifo_taxes_chunked([df], include_details)
+    
+    def calculate_fifo_taxes_chunked(self, chunks, include_details=True):
+        """
+        Calculate FIFO taxes over transactions arriving in chunks
+        
+        Chunks must be in date order (every transaction in a chunk is no
+        older than those in earlier chunks). The open lots of each symbol are
+        carried from one chunk to the next, so only one chunk needs to be in
+        memory at a time.
+        
+        Args:
+            chunks: Iterable of DataFrames with columns: date, symbol, type,
+                quantity, price
+            include_details: Build the per-lot transactions_detail columns
+        
+        transactions_detail is a dict of equal-length NumPy arrays (one per
+        column, ready for pd.DataFrame), or an empty dict when there are no
+        matched sales or details were not requested.
         """
         try:
             results = {
                 'short_term_gain': 0.0,
                 'long_term_gain': 0.0,
                 'estimated_tax': 0.0,
-                'transactions_detail': [],
+                'transactions_detail': {},
                 'holdings_summary': []
             }
             
-            # Group by symbol for separate FIFO calculations
-            symbols = df['symbol'].unique()
+            # Open lot book per symbol: (lot_qty, lot_price, lot_date_ns)
+            open_lots = {}
+            detail_parts = []
             
-            for symbol in symbols:
-                symbol_df = df[df['symbol'] == symbol].sort_values('date')
-                symbol_results = self._calculate_symbol_fifo(symbol, symbol_df)
+            for chunk in chunks:
+                if chunk.empty:
+                    continue
+                
+                # Sort once by symbol then date (stable, so same-time rows
+                # keep file order) so each symbol is one contiguous run
+                chunk = chunk.sort_values(['symbol', 'date'], kind='mergesort')
                 
-                # Aggregate results
-                results['short_term_gain'] += symbol_results['short_term_gain']
-                results['long_term_gain'] += symbol_results['long_term_gain']
-                results['transactions_detail'].extend(symbol_results['transactions_detail'])
+                # Extract the columns once; each symbol then works on slices
+                # (views) of these arrays instead of its own sub-DataFrame
+                all_qty = chunk['quantity'].to_numpy(dtype=np.float64)
+                all_price = chunk['price'].to_numpy(dtype=np.float64)
+                all_date_ns = chunk['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
                 
-                # Add remaining holdings
-                if symbol_results['remaining_holdings']:
-                    results['holdings_summary'].extend(symbol_results['remaining_holdings'])
+                # Types are already lowercased by CSVParser._clean_data. The
+                # comparison runs on category codes when type is categorical
+                all_is_buy = (chunk['type'] == 'buy').to_numpy(dtype=bool, na_value=False)
+                all_is_sell = (chunk['type'] == 'sell').to_numpy(dtype=bool, na_value=False)
+                
+                # Codes follow first appearance, so they increase run by run
+                sym_codes, sym_uniques = pd.factorize(chunk['symbol'], sort=False)
+                run_starts = np.concatenate(([0], np.flatnonzero(np.diff(sym_codes)) + 1))
+                run_ends = np.append(run_starts[1:], len(sym_codes))
+                
+                tasks = []
+                for start, end in zip(run_starts, run_ends):
+                    code = sym_codes[start]
+                    if code < 0:
+                        # Missing symbol
+                        continue
+                    
+                    symbol = sym_uniques[code]
+                    rows = slice(start, end)
+                    tasks.append((
+                        symbol,
+                        all_qty[rows], all_price[rows], all_date_ns[rows],
+                        all_is_buy[rows], all_is_sell[rows],
+                        include_details, open_lots.get(symbol)
+                    ))
+                
+                for task, symbol_results in zip(tasks, self._run_symbol_tasks(tasks, len(chunk))):
+                    open_lots[task[0]] = symbol_results['open_lots']
+                    
+                    # Aggregate results
+                    results['short_term_gain'] += symbol_results['short_term_gain']
+                    results['long_term_gain'] += symbol_results['long_term_gain']
+                    if symbol_results['transactions_detail']:
+                        detail_parts.append(symbol_results['transactions_detail'])
+            
+            # Join the per-symbol detail columns
+            if detail_parts:
+                results['transactions_detail'] = {
+                    column: np.concatenate([part[column] for part in detail_parts])
+                    for column in detail_parts[0]
+                }
+            
+            # Add remaining holdings
+            for symbol, (lot_qty, lot_price, lot_date_ns) in open_lots.items():
+                for k in np.flatnonzero(lot_qty > 0):
+                    results['holdings_summary'].append({
+                        'symbol': symbol,
+                        'quantity': lot_qty[k],
+                        'avg_cost': lot_price[k],
+                        'total_cost_basis': lot_qty[k] * lot_price[k],
+                        'purchase_date': pd.Timestamp(lot_date_ns[k], unit='ns')
+                    })
             
             # Calculate estimated tax
             short_term_tax = max(0, results['short_term_gain']) * self.short_term_tax_rate
@@ -51,122 +301,95 @@ class TaxCalculations:
         except Exception as e:
             raise Exception(f"Error in tax calculations: {str(e)}")
     
-    def _calculate_symbol_fifo(self, symbol, symbol_df):
-        """Calculate FIFO for a specific cryptocurrency symbol"""
+    def _run_symbol_tasks(self, tasks, n_rows):
+        """
+        Run _calculate_symbol_fifo for each task, in parallel for large inputs
         
-        results = {
-            'short_term_gain': 0.0,
-            'long_term_gain': 0.0,
-            'transactions_detail': [],
-            'remaining_holdings': []
-        }
+        Symbols are independent of each other, so chunks with many rows are
+        spread over a thread pool, which shares the arrays instead of
+        pickling them to worker processes. Only the numba kernel (compiled
+        with nogil=True) runs without the GIL; with the NumPy fallback much
+        of each symbol's work is Python-level, so expect little speedup there.
         
-        # FIFO queue to track purchases (lots)
-        fifo_queue = deque()
-        
-        for _, transaction in symbol_df.iterrows():
-            if transaction['type'].lower() == 'buy':
-                # Add to FIFO queue
-                lot = {
-                    'symbol': symbol,
-                    'date': transaction['date'],
-                    'quantity': transaction['quantity'],
-                    'price': transaction['price'],
-                    'cost_basis': transaction['quantity'] * transaction['price']
-                }
-                fifo_queue.append(lot)
-                
-            elif transaction['type'].lower() == 'sell':
-                # Process sale using FIFO
-                sale_results = self._process_sale(
-                    fifo_queue, 
-                    symbol,
-                    transaction['date'],
-                    transaction['quantity'],
-                    transaction['price']
-                )
-                
-                results['short_term_gain'] += sale_results['short_term_gain']
-                results['long_term_gain'] += sale_results['long_term_gain']
-                results['transactions_detail'].extend(sale_results['transactions_detail'])
-        
-        # Add remaining holdings to summary
-        for lot in fifo_queue:
-            if lot['quantity'] > 0:
-                results['remaining_holdings'].append({
-                    'symbol': lot['symbol'],
-                    'quantity': lot['quantity'],
-                    'avg_cost': lot['price'],
-                    'total_cost_basis': lot['cost_basis'],
-                    'purchase_date': lot['date']
-                })
+        Returns:
+            List of per-symbol results, in task order
+        """
+        if len(tasks) < 2 or n_rows < PARALLEL_MIN_ROWS:
+            return [self._calculate_symbol_fifo(*task) for task in tasks]
         
-        return results
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda task: self._calculate_symbol_fifo(*task), tasks))
     
-    def _process_sale(self, fifo_queue, symbol, sale_date, sale_quantity, sale_price):
-        """Process a sale transaction using FIFO"""
+    def _calculate_symbol_fifo(self, symbol, qty, price, date_ns, is_buy, is_sell,
+                               include_details=True, open_lots=None):
+        """
+        Calculate FIFO for a specific cryptocurrency symbol
+        
+        qty, price, date_ns (int64 nanoseconds), is_buy and is_sell are the
+        symbol's transactions in date order. Matching runs in the
+        numba-compiled _fifo_match_kernel when numba is installed and in the
+        vectorized NumPy matcher otherwise. open_lots is the
+        (lot_qty, lot_price, lot_date_ns) book left by an earlier chunk;
+        those lots are sold before any bought here.
+        """
         
         results = {
             'short_term_gain': 0.0,
             'long_term_gain': 0.0,
-            'transactions_detail': []
+            'transactions_detail': {},
+            'open_lots': None
         }
         
-        remaining_to_sell = sale_quantity
-        total_proceeds = sale_quantity * sale_price
+        buy_qty = qty[is_buy]
+        buy_price = price[is_buy]
+        buy_date_ns = date_ns[is_buy]
+        sell_qty = qty[is_sell]
+        sell_price = price[is_sell]
+        sell_date_ns = date_ns[is_sell]
         
-        while remaining_to_sell > 0 and fifo_queue:
-            # Get the oldest lot
-            oldest_lot = fifo_queue[0]
-            
-            if oldest_lot['quantity'] <= remaining_to_sell:
-                # Sell entire lot
-                quantity_sold = oldest_lot['quantity']
-                cost_basis = oldest_lot['cost_basis']
-                fifo_queue.popleft()  # Remove the lot
-            else:
-                # Partial sale of lot
-                quantity_sold = remaining_to_sell
-                cost_basis = (oldest_lot['cost_basis'] / oldest_lot['quantity']) * quantity_sold
-                
-                # Update the remaining lot
-                oldest_lot['quantity'] -= quantity_sold
-                oldest_lot['cost_basis'] -= cost_basis
-            
-            # Calculate gain/loss for this portion
-            proceeds = quantity_sold * sale_price
-            gain_loss = proceeds - cost_basis
-            
-            # Determine if short-term or long-term
-            holding_period = (sale_date - oldest_lot['date']).days
+        # Number of buys preceding each sale - a sale can only consume lots
+        # that were already purchased when it happened
+        buys_before = np.cumsum(is_buy, dtype=np.int64)[is_sell]
+        
+        # Lots carried over from earlier chunks come first in the queue
+        if open_lots is not None:
+            buy_qty = np.concatenate((open_lots[0], buy_qty))
+            buy_price = np.concatenate((open_lots[1], buy_price))
+            buy_date_ns = np.concatenate((open_lots[2], buy_date_ns))
+            buys_before += len(open_lots[0])
+        
+        short_gain, long_gain, det_sale, det_lot, det_qty, lot_qty, head = _fifo_match(
+            buy_qty, buy_price, buy_date_ns,
+            sell_qty, sell_price, sell_date_ns,
+            buys_before, self.long_term_threshold_days * NS_PER_DAY
+        )
+        
+        results['short_term_gain'] = float(short_gain)
+        results['long_term_gain'] = float(long_gain)
+        
+        if include_details and len(det_qty) > 0:
+            proceeds = det_qty * sell_price[det_sale]
+            cost_basis = det_qty * buy_price[det_lot]
+            holding_period = (sell_date_ns[det_sale] - buy_date_ns[det_lot]) // NS_PER_DAY
             is_long_term = holding_period >= self.long_term_threshold_days
             
-            if is_long_term:
-                results['long_term_gain'] += gain_loss
-                term_type = 'Long-term'
-            else:
-                results['short_term_gain'] += gain_loss
-                term_type = 'Short-term'
-            
-            # Add to transaction details
-            results['transactions_detail'].append({
-                'symbol': symbol,
-                'sale_date': sale_date,
-                'purchase_date': oldest_lot['date'],
-                'quantity': quantity_sold,
+            # Typed column arrays - a DataFrame is only built when displayed
+            results['transactions_detail'] = {
+                'symbol': np.full(len(det_qty), str(symbol)),
+                'sale_date': sell_date_ns[det_sale].view('datetime64[ns]'),
+                'purchase_date': buy_date_ns[det_lot].view('datetime64[ns]'),
+                'quantity': det_qty,
                 'proceeds': proceeds,
                 'cost_basis': cost_basis,
-                'gain_loss': gain_loss,
+                'gain_loss': proceeds - cost_basis,
                 'holding_period_days': holding_period,
-                'term_type': term_type
-            })
-            
-            remaining_to_sell -= quantity_sold
+                'term_type': np.where(is_long_term, 'Long-term', 'Short-term')
+            }
         
-        if remaining_to_sell > 0:
-            # Not enough purchases to cover the sale - this shouldn't happen with good data
-            # But we'll handle it gracefully
-            pass
+        # Lots from head onwards are still held
+        remaining = slice(head, None)
+        results['open_lots'] = (lot_qty[remaining], buy_price[remaining], buy_date_ns[remaining])
         
         return results
     
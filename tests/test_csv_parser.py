@@ -0,0 +1,104 @@
+"""
+Chunked parsing must read a file exactly as whole-file parsing does.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from crypto_tax_calculator import CryptoTaxCalculator
+from csv_parser import CSVParser
+
+# dd/mm dates. Read two rows at a time, the middle chunk only has days of
+# 12 or less, so on its own it would also parse as mm/dd
+DAY_FIRST_CSV = """date,symbol,type,quantity,price
+13/11/2022,BTC,buy,1,100
+01/12/2022,BTC,buy,1,110
+05/12/2022,BTC,sell,1,200
+10/12/2022,BTC,buy,2,120
+15/01/2023,BTC,sell,2,150
+20/01/2024,BTC,sell,1,300
+"""
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode())
+
+
+def test_chunked_dates_match_whole_file():
+    whole = CSVParser().parse_csv(csv_file(DAY_FIRST_CSV))
+    chunked = pd.concat(
+        CSVParser().parse_csv_chunked(csv_file(DAY_FIRST_CSV), chunksize=2),
+        ignore_index=True
+    )
+    
+    assert whole['date'].tolist() == chunked['date'].tolist()
+    assert whole['date'].iloc[2] == pd.Timestamp('2022-12-05')
+
+
+def test_chunked_gains_match_whole_file():
+    whole = CryptoTaxCalculator().calculate_taxes(
+        CSVParser().parse_csv(csv_file(DAY_FIRST_CSV))
+    )
+    chunked = CryptoTaxCalculator().calculate_taxes_chunked(
+        CSVParser().parse_csv_chunked(csv_file(DAY_FIRST_CSV), chunksize=2)
+    )
+    
+    assert chunked is not None
+    assert chunked['short_term_gain'] == pytest.approx(whole['short_term_gain'])
+    assert chunked['long_term_gain'] == pytest.approx(whole['long_term_gain'])
+    assert chunked['total_transactions'] == whole['total_transactions']
+
+
+def run_chunked(text, chunksize=2):
+    """Chunked calculation as app.run_chunked_tax_calculation runs it"""
+    parser = CSVParser()
+    calculator = CryptoTaxCalculator()
+    results = calculator.calculate_taxes_chunked(
+        parser.parse_csv_chunked(csv_file(text), chunksize=chunksize)
+    )
+    return results, parser.messages + calculator.messages
+
+
+def test_later_chunk_in_another_date_format_fails():
+    # The first chunk reads as mm/dd, which 15/01/2023 does not fit
+    text = """date,symbol,type,quantity,price
+01/12/2022,BTC,buy,1,100
+05/12/2022,BTC,buy,1,100
+10/12/2022,BTC,buy,1,100
+15/01/2023,BTC,sell,1,200
+"""
+    results, messages = run_chunked(text, chunksize=3)
+    
+    assert results is None
+    errors = [text for level, text in messages if level == 'error']
+    assert len(errors) == 1
+    assert 'format' in errors[0]
+    assert not errors[0].startswith('Error in tax calculations')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("date,symbol,type,quantity\n2023-01-01,BTC,buy,1\n",
+     "Missing required columns: price"),
+    ("date,symbol,type,quantity,price\n2023-02-01,BTC,buy,1,100\n2023-01-01,BTC,sell,1,200\n",
+     "Large files must be sorted by date (oldest first) to be processed in chunks"),
+])
+def test_parser_errors_are_reported_once_without_prefix(text, expected):
+    results, messages = run_chunked(text)
+    
+    assert results is None
+    assert [text for level, text in messages if level == 'error'] == [expected]
+
+
+def test_chunked_warns_about_unknown_types_once():
+    text = """date,symbol,type,quantity,price
+2023-01-01,BTC,buy,1,100
+2023-01-02,BTC,transfer,1,100
+2023-01-03,BTC,transfer,1,100
+2023-01-04,BTC,sell,1,200
+"""
+    results, messages = run_chunked(text)
+    
+    assert results['short_term_gain'] == pytest.approx(100)
+    warnings = [text for level, text in messages if level == 'warning']
+    assert warnings == ["Found unexpected transaction types that will be ignored: transfer"]
@@ -0,0 +1,126 @@
+"""
+The numba kernel and the NumPy fallback must give the same FIFO results -
+any given install only ever runs one of them.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import tax_calculations
+from tax_calculations import (
+    NS_PER_DAY,
+    TaxCalculations,
+    _fifo_match_kernel,
+    _fifo_match_vectorized,
+)
+
+# The plain Python version of the kernel when numba has compiled it
+fifo_match_kernel = getattr(_fifo_match_kernel, 'py_func', _fifo_match_kernel)
+
+THRESHOLD_NS = 365 * NS_PER_DAY
+
+
+def random_transactions(seed, n_rows=60):
+    """Sorted buys and sells for one symbol with decimal-rounded quantities"""
+    rng = np.random.default_rng(seed)
+    scale = rng.choice([0.001, 1.0, 1000.0, 1e10])
+    quantity = np.round(rng.random(n_rows) * scale, int(rng.integers(1, 9)))
+    
+    return pd.DataFrame({
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(
+            np.sort(rng.integers(0, 900, n_rows)), unit='D'
+        ),
+        'symbol': 'BTC',
+        'type': rng.choice(['buy', 'sell'], n_rows),
+        'quantity': np.maximum(quantity, 1e-8),
+        'price': rng.random(n_rows) * 100 + 1,
+    })
+
+
+def matcher_inputs(df):
+    """Split a single-symbol frame into the matcher's buy and sell arrays"""
+    is_buy = (df['type'] == 'buy').to_numpy()
+    qty = df['quantity'].to_numpy(dtype=np.float64)
+    price = df['price'].to_numpy(dtype=np.float64)
+    date_ns = df['date'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+    buys_before = np.cumsum(is_buy)[~is_buy]
+    
+    return (qty[is_buy], price[is_buy], date_ns[is_buy],
+            qty[~is_buy], price[~is_buy], date_ns[~is_buy],
+            buys_before, THRESHOLD_NS)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_matchers_agree(seed):
+    inputs = matcher_inputs(random_transactions(seed))
+    
+    expected = fifo_match_kernel(*inputs)
+    actual = _fifo_match_vectorized(*inputs)
+    
+    short_gain, long_gain, det_sale, det_lot, det_qty, lot_qty, head = expected
+    
+    # The vectorized matcher takes differences of running totals, so its
+    # quantities are exact only to a few ulps of the total bought
+    atol = 1e-12 * inputs[0].sum()
+    
+    assert actual[0] == pytest.approx(short_gain, rel=1e-9, abs=1e-9)
+    assert actual[1] == pytest.approx(long_gain, rel=1e-9, abs=1e-9)
+    np.testing.assert_array_equal(actual[2], det_sale)
+    np.testing.assert_array_equal(actual[3], det_lot)
+    np.testing.assert_allclose(actual[4], det_qty, rtol=1e-9, atol=atol)
+    assert actual[6] == head
+    np.testing.assert_allclose(actual[5][head:], lot_qty[head:], rtol=1e-9,
+                               atol=atol)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_compiled_kernel_agrees(seed):
+    # The njit build is what runs whenever numba is installed
+    pytest.importorskip('numba')
+    assert hasattr(_fifo_match_kernel, 'py_func')
+    
+    inputs = matcher_inputs(random_transactions(seed))
+    
+    compiled = _fifo_match_kernel(*inputs)
+    vectorized = _fifo_match_vectorized(*inputs)
+    
+    assert compiled[0] == pytest.approx(vectorized[0], rel=1e-9, abs=1e-9)
+    assert compiled[1] == pytest.approx(vectorized[1], rel=1e-9, abs=1e-9)
+    np.testing.assert_array_equal(compiled[2], vectorized[2])
+    np.testing.assert_array_equal(compiled[3], vectorized[3])
+    assert compiled[6] == vectorized[6]
+    
+    atol = 1e-12 * inputs[0].sum()
+    head = compiled[6]
+    np.testing.assert_allclose(compiled[4], vectorized[4], rtol=1e-9, atol=atol)
+    np.testing.assert_allclose(compiled[5][head:], vectorized[5][head:], rtol=1e-9,
+                               atol=atol)
+
+
+@pytest.mark.parametrize('seed', range(50))
+@pytest.mark.parametrize('chunk_rows', [1, 7])
+def test_chunked_holdings_agree(monkeypatch, seed, chunk_rows):
+    df = random_transactions(seed)
+    chunks = [df.iloc[start:start + chunk_rows]
+              for start in range(0, len(df), chunk_rows)]
+    
+    results = {}
+    for name, matcher in [('kernel', fifo_match_kernel),
+                          ('vectorized', _fifo_match_vectorized)]:
+        monkeypatch.setattr(tax_calculations, '_fifo_match', matcher)
+        results[name] = TaxCalculations().calculate_fifo_taxes_chunked(chunks)
+    
+    kernel, vectorized = results['kernel'], results['vectorized']
+    assert vectorized['short_term_gain'] == pytest.approx(
+        kernel['short_term_gain'], rel=1e-9, abs=1e-9)
+    assert vectorized['long_term_gain'] == pytest.approx(
+        kernel['long_term_gain'], rel=1e-9, abs=1e-9)
+    
+    # Rounding leftovers must not show up as open lots
+    for holdings in (kernel['holdings_summary'], vectorized['holdings_summary']):
+        for lot in holdings:
+            assert lot['quantity'] > 1e-12
+    
+    assert ([lot['quantity'] for lot in vectorized['holdings_summary']]
+            == pytest.approx([lot['quantity'] for lot in kernel['holdings_summary']],
+                             rel=1e-9))
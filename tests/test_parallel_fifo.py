@@ -0,0 +1,52 @@
+"""
+Per-symbol FIFO run on a thread pool must match the sequential run.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import tax_calculations
+from tax_calculations import TaxCalculations
+
+
+def random_transactions(seed, n_rows=400, symbols=('BTC', 'ETH', 'DOGE', 'SOL')):
+    """Sorted buys and sells spread over several symbols"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(
+            np.sort(rng.integers(0, 900, n_rows)), unit='D'
+        ),
+        'symbol': rng.choice(list(symbols), n_rows),
+        'type': rng.choice(['buy', 'sell'], n_rows, p=[0.6, 0.4]),
+        'quantity': np.round(rng.random(n_rows) * 10, 4) + 0.0001,
+        'price': rng.random(n_rows) * 100 + 1,
+    })
+
+
+def test_thread_pool_matches_sequential(monkeypatch):
+    df = random_transactions(0)
+    sequential = TaxCalculations().calculate_fifo_taxes(df)
+    
+    pools = []
+    
+    class RecordingExecutor(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+    
+    monkeypatch.setattr(tax_calculations, 'PARALLEL_MIN_ROWS', 0)
+    monkeypatch.setattr(tax_calculations, 'ThreadPoolExecutor', RecordingExecutor)
+    parallel = TaxCalculations().calculate_fifo_taxes(df)
+    
+    assert pools, "the thread pool branch did not run"
+    
+    assert parallel['short_term_gain'] == sequential['short_term_gain']
+    assert parallel['long_term_gain'] == sequential['long_term_gain']
+    assert parallel['estimated_tax'] == sequential['estimated_tax']
+    
+    assert parallel['transactions_detail'].keys() == sequential['transactions_detail'].keys()
+    for column, values in sequential['transactions_detail'].items():
+        np.testing.assert_array_equal(parallel['transactions_detail'][column], values)
+    
+    assert parallel['holdings_summary'] == sequential['holdings_summary']
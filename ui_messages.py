@@ -0,0 +1,17 @@
+class UIMessages:
+    """
+    Mixin that collects messages for the UI instead of showing them
+    
+    Messages are (level, text) pairs, e.g. ('error', '...'), where level is
+    'error', 'warning' or 'info'. Keeping Streamlit calls out of the parser
+    and calculator lets their results be cached and the messages replayed
+    by app.show_messages.
+    """
+    
+    def _clear_messages(self):
+        """Start an empty message list for a new run"""
+        self.messages = []
+    
+    def _notify(self, level, text):
+        """Record a message for the UI (level is 'error', 'warning' or 'info')"""
+        self.messages.append((level, text))